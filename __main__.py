@@ -1,9 +1,57 @@
 import configparser
-from os import path
+import os
 import sys
 from PyQt5.QtWidgets import QApplication
 from utils import InitBN
 from app import NetworkGraphApp
+from bayes_network import BayesNetwork
+
+CONFIG_PATH = 'config.ini'
+
+_CONFIG_CACHE: dict[str, tuple[int, configparser.ConfigParser]] = {}
+_BN_CACHE: dict[str, tuple[int, BayesNetwork]] = {}
+
+def LoadConfig(configPath: str) -> configparser.ConfigParser:
+    """
+    Loads the configuration file, re-parsing it only if it changed since the last load.
+
+    Args:
+        configPath (str): The path to the configuration file.
+
+    Returns:
+        configparser.ConfigParser: The parsed configuration.
+
+    Raises:
+        FileNotFoundError: If the configuration file does not exist.
+    """
+    mtime = os.stat(configPath).st_mtime_ns
+    cached = _CONFIG_CACHE.get(configPath)
+    if cached is not None and cached[0] == mtime: return cached[1]
+    config = configparser.ConfigParser(interpolation=None)
+    with open(configPath) as f:
+        config.read_file(f)
+    _CONFIG_CACHE[configPath] = (mtime, config)
+    return config
+
+def LoadBN(filePath: str) -> BayesNetwork:
+    """
+    Loads the Bayes Network from the given file, rebuilding it only if the file changed since the last load.
+
+    Args:
+        filePath (str): The path to the Bayes Network configuration file.
+
+    Returns:
+        BayesNetwork: The initialized Bayes Network.
+
+    Raises:
+        FileNotFoundError: If the Bayes Network configuration file does not exist.
+    """
+    mtime = os.stat(filePath).st_mtime_ns
+    cached = _BN_CACHE.get(filePath)
+    if cached is not None and cached[0] == mtime: return cached[1]
+    bayesNetwork = InitBN(filePath)
+    _BN_CACHE[filePath] = (mtime, bayesNetwork)
+    return bayesNetwork
 
 def Main():
     """Main function of the project
@@ -11,12 +59,10 @@ def Main():
         argc (int): System Arguments Count
         argv (list[str]): System Arguments
     """
-    config = configparser.ConfigParser()
-    config.read('config.ini')
+    config = LoadConfig(CONFIG_PATH)
     filePath = config['settings'].get('bayes_network_config_path', './tests/test0.txt')
-    assert path.exists(filePath), "Path to grid configuration file does not exist!"
 
-    bayesNetwork = InitBN(filePath)
+    bayesNetwork = LoadBN(filePath)
     # print(bayesNetwork.AllSimplePathsEdges())
     # print(bayesNetwork.FindNonBlockedPath((0, 1), (1, 0), {'season': 'medium'}))
     # print(bayesNetwork.EnumerationAsk([((0, 1), (1 , 1))], {'season': 'low'}), '\n\n')
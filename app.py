@@ -1,9 +1,99 @@
+import traceback
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal, pyqtSlot
 from PyQt5.QtWidgets import QMainWindow, QVBoxLayout, QWidget, QComboBox, QTextEdit, QPushButton, QLabel, QHBoxLayout
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas,\
     NavigationToolbar2QT as NavigationToolbar
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import networkx as nx
-from bayes_network import BayesNetwork
+from bayes_network import BayesNetwork, ROUND_DIGITS
+from type_aliases import BNNode, Edge, Node
+
+# Maximum number of paths whose probabilities are all computed on every evidence change,
+# beyond it only the selected path's probability is computed
+MAX_EAGER_PATHS = 1000
+
+def RoundProbabilities(value):
+    """
+    Rounds the probabilities in a (possibly nested) inference result for display.
+
+    Args:
+        value: A probability, or a dictionary, list or tuple of results.
+
+    Returns:
+        The result with every float rounded to ROUND_DIGITS digits.
+    """
+    if isinstance(value, float): return round(value, ROUND_DIGITS)
+    if isinstance(value, dict): return {k: RoundProbabilities(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)): return type(value)(RoundProbabilities(v) for v in value)
+    return value
+
+def ComputeProbabilities(bn: BayesNetwork, evidence: dict[BNNode, bool | str]) -> dict:
+    """
+    Runs the marginal inference displayed by the GUI.
+
+    Args:
+        bn (BayesNetwork): The Bayes Network to query.
+        evidence (dict[BNNode, bool | str]): The evidence for inference.
+
+    Returns:
+        dict: The marginals of all the nodes.
+    """
+    return bn.EliminationAskAllJoint(evidence)
+
+def ComputePathProbabilities(bn: BayesNetwork, evidence: dict[BNNode, bool | str], startNode: Node | None,
+                             endNode: Node | None, paths: list[list[Edge]] | None = None) -> dict:
+    """
+    Runs the path inference displayed by the GUI.
+
+    Args:
+        bn (BayesNetwork): The Bayes Network to query.
+        evidence (dict[BNNode, bool | str]): The evidence for inference.
+        startNode (Node | None): The start node of the highest probability path, if selected.
+        endNode (Node | None): The end node of the highest probability path, if selected.
+        paths (list[list[Edge]] | None): The paths whose probabilities are recomputed, if any.
+
+    Returns:
+        dict: The probability of every path under 'pathProbabilities' when paths are given, and the highest
+            probability non-blocked path under 'path' when both path nodes are selected.
+    """
+    results = {}
+    if paths is not None:
+        results['pathProbabilities'] = bn.EliminationAskSetBatch(paths, evidence)
+    if startNode is not None and endNode is not None:
+        results['path'] = bn.FindNonBlockedPath(startNode, endNode, evidence)
+    return results
+
+class InferenceSignals(QObject):
+    # Emitted with the request generation and the results of ComputeProbabilities, before the path queries run
+    marginals = pyqtSignal(int, dict)
+    # Emitted with the request generation and the results of ComputePathProbabilities
+    done = pyqtSignal(int, dict)
+    # Emitted with the request generation when the inference raised
+    failed = pyqtSignal(int)
+
+class InferenceRunnable(QRunnable):
+    def __init__(self, bn: BayesNetwork, evidence: dict[BNNode, bool | str], startNode: Node | None,
+                 endNode: Node | None, paths: list[list[Edge]] | None, generation: int):
+        super().__init__()
+        self.bn = bn
+        self.evidence = evidence
+        self.startNode = startNode
+        self.endNode = endNode
+        self.paths = paths
+        self.generation = generation
+        self.signals = InferenceSignals()
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            # The marginals are shown without waiting for the path queries, which may take much longer
+            self.signals.marginals.emit(self.generation, ComputeProbabilities(self.bn, self.evidence))
+            self.signals.done.emit(self.generation, ComputePathProbabilities(self.bn, self.evidence, self.startNode,
+                                                                             self.endNode, self.paths))
+        except Exception: # an exception escaping run would abort the application
+            traceback.print_exc()
+            # The window is always told the request is over, so it can accept evidence again
+            self.signals.failed.emit(self.generation)
 
 class NetworkGraphApp(QMainWindow):
     def __init__(self, bn: BayesNetwork):
@@ -14,6 +104,9 @@ class NetworkGraphApp(QMainWindow):
         self.width = 1440
         self.height = 810
         self.bn = bn
+        self.inferenceGeneration = 0
+        # The generation of the request whose marginals are on display
+        self.shownGeneration = 0
         self.InitUI()
 
     def InitUI(self):
@@ -21,8 +114,11 @@ class NetworkGraphApp(QMainWindow):
         self.setGeometry(self.left, self.top, self.width, self.height)
 
         # Initialize matplotlib figure for embedding
-        self.figure = plt.figure(figsize=(9, 9))
+        self.figure = Figure(figsize=(9, 9))
         self.canvas = FigureCanvas(self.figure)
+        self.cptTexts = {}
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.OnCanvasDraw)
 
         # Layout
         self.layout = QVBoxLayout()
@@ -36,9 +132,8 @@ class NetworkGraphApp(QMainWindow):
         # Dropdown for selecting the query category (Layer)
         self.dropdown1 = QComboBox(self)
         self.dropdown1.addItem("Select Node For Evidence")
-        for node in self.bn.bn.nodes:
-            if node != 'season' and sum(self.bn.VarCPT(node).values()) == 0: continue
-            self.dropdown1.addItem(str(node))
+        for node in self.bn.populatedNodes:
+            self.dropdown1.addItem(str(node), node)
         self.layout.addWidget(self.dropdown1)
 
         # Dropdown for specific options based on the first dropdown's selection
@@ -67,8 +162,14 @@ class NetworkGraphApp(QMainWindow):
         # Dropdown for selecting the query category (Layer)
         self.dropdown3 = QComboBox(self)
         self.dropdown3.addItem("Select Path For Probability Calculation")
-        for path in self.bn.AllSimplePathsEdges():
-            self.dropdown3.addItem(str(path))
+        self.paths = self.bn.AllSimplePathsEdges()
+        for i, path in enumerate(self.paths):
+            self.dropdown3.addItem(str(path), i)
+        # The path probabilities known for the evidence version, keyed by path index, filled in by the inference
+        # requests, and the path indices the running request computes
+        self.pathProbabilities: dict[int, float] = {}
+        self.pathProbabilitiesVersion = None
+        self.pendingPaths: list[int] = []
         self.layout.addWidget(self.dropdown3)
         
         # Set the layout on the application's window
@@ -82,7 +183,7 @@ class NetworkGraphApp(QMainWindow):
         self.startDD.addItem("Select Start Node for path")
         for node in self.bn.bn.nodes:
             if isinstance(node, tuple) and not isinstance(node[0], tuple):
-                self.startDD.addItem(str(node))
+                self.startDD.addItem(str(node), node)
         self.startEndLayout.addWidget(self.startDD)
         self.startDD.currentIndexChanged.connect(self.UpdateEndNodeDD)
         
@@ -91,7 +192,7 @@ class NetworkGraphApp(QMainWindow):
         self.endDD.addItem("Select End Node for path")
         for node in self.bn.bn.nodes:
             if isinstance(node, tuple) and not isinstance(node[0], tuple):
-                self.endDD.addItem(str(node))
+                self.endDD.addItem(str(node), node)
         self.startEndLayout.addWidget(self.endDD)
         # self.endDD.currentIndexChanged.connect(self.CalculateProbabilities)
         self.layout.addLayout(self.startEndLayout)
@@ -122,7 +223,6 @@ class NetworkGraphApp(QMainWindow):
         # Add the info label and existing vertical layout to the horizontal layout
         self.layout2.addWidget(self.infoLabel)
         
-        self.CalculateProbabilities()
         self.setCentralWidget(self.mainWidget)
 
 
@@ -133,86 +233,168 @@ class NetworkGraphApp(QMainWindow):
         self.layout2.addWidget(self.infoLabel2)
         self.hLayout.addLayout(self.layout)  # self.layout is your existing QVBoxLayout
         self.hLayout.addLayout(self.layout2)  # self.layout is your existing QVBoxLayout
-        self.dropdown3.currentIndexChanged.connect(self.ProcessPathProbability)
-        self.hPPath.clicked.connect(self.CalculateProbabilities)
+        # Debounce the path selection so scrolling through the paths only evaluates the final one
+        self.pathDebounce = QTimer(self)
+        self.pathDebounce.setSingleShot(True)
+        self.pathDebounce.setInterval(120)
+        self.pathDebounce.timeout.connect(self.ProcessPathProbability)
+        self.dropdown3.currentIndexChanged.connect(lambda: self.pathDebounce.start())
+        self.hPPath.clicked.connect(self.StartInference)
 
+        self.DrawStaticGraph()
         self.PlotGraph()
+        self.StartInference()
 
     def PlotGraph(self):
-        # Clear previous figure
-        self.figure.clf()
-        plt.subplots_adjust(bottom=0.25)  # left, bottom, width, height (range 0 to 1)
+        # The axes and the graph artists persist, a refresh only updates the CPT texts
+        self.DrawCPTOverlay()
+
+    def DrawStaticGraph(self):
+        # Called once, the axes and the node, edge and label artists are kept for the lifetime of the window
+        self.figure.subplots_adjust(bottom=0.25)  # left, bottom, width, height (range 0 to 1)
 
         pos = self.bn.HierarchicalLayout()
 
         # Draw the graph
-        nx.draw(self.bn.bn, pos, with_labels=True, ax=self.figure.add_subplot(111), font_size=10, node_size=1500)
+        self.ax = self.figure.add_subplot(111)
+        self.nodeArtists = nx.draw_networkx_nodes(self.bn.bn, pos, ax=self.ax, node_size=1500)
+        self.edgeArtists = nx.draw_networkx_edges(self.bn.bn, pos, ax=self.ax, node_size=1500)
+        self.labelArtists = nx.draw_networkx_labels(self.bn.bn, pos, ax=self.ax, font_size=10)
+        self.ax.set_axis_off()
+
+        # CPT texts are animated so they are left out of the cached background and blitted on top of it
+        self.cptTexts = {node: self.ax.text(pos[node][0], pos[node][1] - 0.2, s='', animated=True,\
+            bbox=dict(facecolor='white', alpha=0.5), horizontalalignment='center',)
+            for node in self.bn.topoOrder}
+        self.background = None
 
-        for node in nx.topological_sort(self.bn.bn):
-            varCPT = '\n'.join([f"{k}: {v[0] if isinstance(v, list) else v}" for k, v in self.bn.VarCPT(node).items()])
-            plt.text(pos[node][0], pos[node][1] - 0.2, s=varCPT,\
-                bbox=dict(facecolor='white', alpha=0.5), horizontalalignment='center',)
+        # Schedule a redraw instead of blocking the event loop
+        self.canvas.draw_idle()
 
-        # Refresh canvas
-        self.canvas.draw()
+    def OnCanvasDraw(self, event):
+        # The canvas was fully redrawn (first show, resize, toolbar), so re-cache the static background
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        for text in self.cptTexts.values():
+            self.ax.draw_artist(text)
 
-    def CalculateProbabilities(self):
-        self.infoLabel.setText('\n'.join([f'{k}: {v}' for k, v in self.bn.EnumerationAskAll(self.bn.evidence).items()]))
-        if self.startDD.currentText() == "Select Start Node for path" or self.endDD.currentText() == "Select End Node for path":
-            return
-        print(f'{self.startDD.currentText()=}, {self.endDD.currentText()=}')
-        startNode = eval(self.startDD.currentText())
-        endNode = eval(self.endDD.currentText())
-        self.infoLabel2.setText(f'Highest probability of Non Blockage path is the path: {self.bn.FindNonBlockedPath(startNode, endNode, self.bn.evidence)}')
+    def DrawCPTOverlay(self):
+        for node, text in self.cptTexts.items():
+            text.set_text(self.bn.cptLabels[node])
+
+        # Until the first full draw caches the background, the draw event renders the texts
+        if self.background is None: return
+        self.canvas.restore_region(self.background)
+        for text in self.cptTexts.values():
+            self.ax.draw_artist(text)
+        self.canvas.blit(self.figure.bbox)
+
+    def StartInference(self):
+        # Run the inference on the thread pool so the UI stays responsive, pending results of older requests are dropped
+        self.inferenceGeneration += 1
+        # Evidence changes are ignored until the results of this request are shown
+        self.evidenceButton.setEnabled(False)
+        self.clearEvidence.setEnabled(False)
+        # The path probabilities only change with the evidence, and with many paths only the selected one is computed
+        if self.pathProbabilitiesVersion != self.bn.evidenceVersion:
+            self.pathProbabilities = {}
+            self.pathProbabilitiesVersion = self.bn.evidenceVersion
+        indices = range(len(self.paths)) if len(self.paths) <= MAX_EAGER_PATHS else [self.dropdown3.currentData()]
+        self.pendingPaths = [i for i in indices if i is not None and i not in self.pathProbabilities]
+        paths = [self.paths[i] for i in self.pendingPaths] if self.pendingPaths else None
+        runnable = InferenceRunnable(self.bn, self.bn.evidence.copy(), self.startDD.currentData(),
+                                     self.endDD.currentData(), paths, self.inferenceGeneration)
+        runnable.signals.marginals.connect(self.ShowProbabilities)
+        runnable.signals.done.connect(self.ShowPathProbabilities)
+        runnable.signals.failed.connect(self.InferenceFailed)
+        QThreadPool.globalInstance().start(runnable)
+
+    @pyqtSlot(int, dict)
+    def ShowProbabilities(self, generation: int, probabilities: dict):
+        if generation != self.inferenceGeneration: return # superseded by a newer request
+        self.shownGeneration = generation
+        # Evidence is accepted again once the marginals are shown, the path queries may still be running
+        self.evidenceButton.setEnabled(True)
+        self.clearEvidence.setEnabled(True)
+        probabilities = RoundProbabilities(probabilities)
+        self.infoLabel.setText('\n'.join([f'{k}: {v}' for k, v in probabilities.items()]))
+
+    @pyqtSlot(int, dict)
+    def ShowPathProbabilities(self, generation: int, results: dict):
+        if generation != self.inferenceGeneration: return # superseded by a newer request
+        if 'path' in results:
+            self.infoLabel2.setText('Highest probability of Non Blockage path is the path: '
+                                    f'{RoundProbabilities(results["path"])}')
+        if 'pathProbabilities' in results:
+            # Every evidence change starts a newer request, so the results of this one are for the current evidence
+            self.pathProbabilities.update(zip(self.pendingPaths, results['pathProbabilities']))
+            self.pendingPaths = []
+            self.ProcessPathProbability()
+
+    @pyqtSlot(int)
+    def InferenceFailed(self, generation: int):
+        if generation != self.inferenceGeneration: return # superseded by a newer request
+        self.evidenceButton.setEnabled(True)
+        self.clearEvidence.setEnabled(True)
+        # The paths of this request are computed again when they are selected next
+        self.pendingPaths = []
+        # The marginals of this request stay on display when only the path queries failed
+        label = self.infoLabel2 if self.shownGeneration == generation else self.infoLabel
+        label.setText('Inference failed, see the console for details.')
 
     def ProcessEvidence(self):
         # Example process: Use selections to generate a result
-        node = self.dropdown1.currentText()
-        option = self.dropdown2.currentText()
-
-        node = node if isinstance(node, str) and node.lower() == 'season' else eval(node)
-        option = option.lower() if isinstance(node, str) and node.lower() == 'season' else eval(option)
-        self.bn.evidence[node] = option
+        node = self.dropdown1.currentData()
+        option = self.dropdown2.currentData()
 
-        # You would replace this with your actual query processing logic
-        if node != "Select Node For Evidence" and option != "Select Evidence Value":
+        # The placeholder items carry no data
+        if node is not None and option is not None:
+            self.bn.SetEvidence(node, option)
             self.evidenceDisplay.setPlainText(f"Evidence is {self.bn.evidence}")
         else:
             self.evidenceDisplay.setPlainText("Please select valid options.")
+        self.StartInference()
         self.ProcessPathProbability()
-        self.CalculateProbabilities()
 
     def UpdateDropdown2(self):
         # Get the current text (selected item) from the first dropdown
-        selectedItem = self.dropdown1.currentText()
+        selectedItem = self.dropdown1.currentData()
 
         self.dropdown2.clear()
         self.dropdown2.addItem('Select Evidence Value')
-        if selectedItem.lower() == 'season':
-            self.dropdown2.addItems(['Low', 'Medium', 'High'])
+        if selectedItem == 'season':
+            for option in ['low', 'medium', 'high']:
+                self.dropdown2.addItem(option.capitalize(), option)
 
         else:
-            self.dropdown2.addItems(['True', 'False'])
+            for option in [True, False]:
+                self.dropdown2.addItem(str(option), option)
 
     def UpdateEndNodeDD(self):
         # Get the current text (selected item) from the first dropdown
-        selectedItem = eval(self.startDD.currentText())
+        selectedItem = self.startDD.currentData()
 
         self.endDD.clear()
         self.endDD.addItem('Select End Node for path')
         for node in self.bn.bn.nodes:
             if node != selectedItem and isinstance(node, tuple) and not isinstance(node[0], tuple):
                 print(f"{node=}, {selectedItem=}")
-                self.endDD.addItem(str(node))
+                self.endDD.addItem(str(node), node)
 
     def ClearEvidence(self):
         self.bn.ClearEvidence()
         self.evidenceDisplay.setPlainText('')
-        self.CalculateProbabilities()
+        self.StartInference()
         self.ProcessPathProbability()
 
     def ProcessPathProbability(self):
         # Example process: Use selections to generate a result
-        path = self.dropdown3.currentText()
-        if path != "Select Path For Probability Calculation":
-            self.pathResults.setText(f"Probability of Path {path} is:\n{self.bn.EnumerationAskSet(eval(path), self.bn.evidence)}")
\ No newline at end of file
+        pathIndex = self.dropdown3.currentData()
+        if pathIndex is not None:
+            path = self.paths[pathIndex]
+            if self.pathProbabilitiesVersion != self.bn.evidenceVersion or pathIndex not in self.pathProbabilities:
+                # ShowPathProbabilities fills the probability in once a request computes it
+                self.pathResults.setText(f"Probability of Path {path} is:\nCalculating...")
+                if pathIndex not in self.pendingPaths: self.StartInference()
+                return
+            self.pathResults.setText(f"Probability of Path {path} is:\n"
+                                     f"{RoundProbabilities(self.pathProbabilities[pathIndex])}")
\ No newline at end of file
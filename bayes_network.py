@@ -1,9 +1,172 @@
 from __future__ import annotations
-import copy as cp
+import functools as ft
+import itertools as it
 import networkx as nx
+import numpy as np
+from collections.abc import Iterator
 from type_aliases import Node, Edge, BNNode
 
+# Number of digits probabilities are rounded to when displayed, results are not rounded
 ROUND_DIGITS = 5
+# Maximum number of free query variables whose joint EliminationAskSetBatch materializes
+MAX_BATCH_JOINT_VARS = 20
+# Maximum number of EnumerationAll results memoized per network
+ENUMERATION_CACHE_SIZE = 1 << 16
+# Kinds of variables in the network, which determine the shape of their CPT and parents
+SEASON_KIND, VERTEX_KIND, EDGE_KIND = 0, 1, 2
+
+def EnumerateAllKernel(order, values, fixed, sizes, childPtr, childIds, childStrides, cptOffset, cptFlat):
+    """
+    Sums the product of the CPT entries over all the assignments of the free variables in order.
+
+    The recursion of the enumeration-all algorithm is unrolled into an explicit stack over the depth in order.
+    The CPT row of every variable is kept up to date incrementally as its parents are assigned,
+    so a CPT probe is a single indexed load. Branches whose partial product is 0 are not descended into.
+
+    Args:
+        order (np.ndarray): The variable ids to enumerate, in topological order.
+        values (np.ndarray): The value index of every variable, evidence variables are pre-assigned.
+        fixed (np.ndarray): Whether each variable is observed.
+        sizes (np.ndarray): The domain size of every variable.
+        childPtr, childIds, childStrides (np.ndarray): The children of variable v are
+            childIds[childPtr[v]:childPtr[v + 1]], and v's value is weighted by childStrides in each child's CPT row.
+        cptOffset, cptFlat (np.ndarray): P(v = x | parents) is cptFlat[cptOffset[v] + row * sizes[v] + x].
+
+    Returns:
+        float: The probability of the evidence (restricted to the variables in order).
+    """
+    n = order.shape[0]
+    if n == 0: return 1.0
+    # Unassigned variables contribute 0 to their children's rows, like the first value of their domain
+    rows = np.zeros(sizes.shape[0], dtype=np.int64)
+    for v in range(sizes.shape[0]):
+        if values[v] > 0:
+            for k in range(childPtr[v], childPtr[v + 1]):
+                rows[childIds[k]] += values[v] * childStrides[k]
+    prod = np.ones(n + 1)
+    choice = np.full(n, -1)
+    total = 0.0
+    d = 0
+    while d >= 0:
+        v = order[d]
+        if choice[d] == -1:
+            choice[d] = 0
+            if not fixed[v]: values[v] = 0
+        elif fixed[v] or choice[d] + 1 >= sizes[v]:
+            if not fixed[v]:
+                for k in range(childPtr[v], childPtr[v + 1]):
+                    rows[childIds[k]] -= values[v] * childStrides[k]
+                values[v] = -1
+            choice[d] = -1
+            d -= 1
+            continue
+        else:
+            choice[d] += 1
+            values[v] = choice[d]
+            for k in range(childPtr[v], childPtr[v + 1]):
+                rows[childIds[k]] += childStrides[k]
+        prod[d + 1] = prod[d] * cptFlat[cptOffset[v] + rows[v] * sizes[v] + values[v]]
+        if prod[d + 1] == 0.0: continue # every assignment below this branch has probability 0
+        if d + 1 == n:
+            total += prod[n]
+        else:
+            d += 1
+    return total
+
+@ft.cache
+def CompiledEnumerateAllKernel():
+    """
+    Returns EnumerateAllKernel JIT-compiled with numba, compiling it the first time an enumeration runs.
+
+    numba is imported here instead of with the module, so code that never enumerates, like the GUI,
+    does not pay for importing it.
+
+    Returns:
+        The compiled kernel, or EnumerateAllKernel itself when numba is not installed.
+    """
+    try:
+        from numba import njit
+    except ImportError: # numba is optional, without it the kernel runs as plain Python
+        return EnumerateAllKernel
+    return njit(cache=True)(EnumerateAllKernel)
+
+def SimplePathsFromSource(adjacency: dict[Node, tuple[Node, ...]], start: Node) -> dict[Node, list[list[Edge]]]:
+    """
+    Finds all simple paths from a node to every other node with a single iterative depth-first search.
+
+    Every prefix of a simple path is itself a simple path, so each step of the search yields a path to the node
+    it reaches. The paths to each target are in the same order as nx.all_simple_paths.
+
+    Args:
+        adjacency (dict[Node, tuple[Node, ...]]): The neighbours of every grid vertex.
+        start (Node): The starting node of the paths.
+
+    Returns:
+        dict[Node, list[list[Edge]]]: The paths from start to each other node, as lists of edges.
+    """
+    paths: dict[Node, list[list[Edge]]] = {node: [] for node in adjacency if node != start}
+    pathNodes = [start]
+    pathEdges: list[Edge] = []
+    visited = {start}
+    stack = [iter(adjacency[start])]
+    while stack:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+            visited.discard(pathNodes.pop())
+            if pathEdges: pathEdges.pop()
+        elif node not in visited:
+            pathEdges.append((pathNodes[-1], node))
+            paths[node].append(list(pathEdges))
+            pathNodes.append(node)
+            visited.add(node)
+            stack.append(iter(adjacency[node]))
+    return paths
+
+def Freeze(value):
+    """
+    Converts a (possibly nested) query argument into a hashable value.
+
+    Args:
+        value: The value to freeze, dictionaries become frozensets of items and lists become tuples.
+
+    Returns:
+        The hashable value.
+    """
+    if isinstance(value, dict): return frozenset((k, Freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)): return tuple(Freeze(v) for v in value)
+    return value
+
+def CopyResult(value):
+    """
+    Copies a (possibly nested) query result, so the caller may mutate it without changing the cached result.
+
+    Args:
+        value: The result to copy, dictionaries and lists are copied recursively.
+
+    Returns:
+        The copied result.
+    """
+    if isinstance(value, dict): return {k: CopyResult(v) for k, v in value.items()}
+    if isinstance(value, list): return [CopyResult(v) for v in value]
+    return value
+
+def MemoizedQuery(method):
+    """
+    Memoizes a BayesNetwork query method on its frozen arguments and the network's evidence version.
+
+    Every call returns its own copy of the cached result, as the unmemoized methods return fresh results.
+    """
+    @ft.wraps(method)
+    def Wrapper(self: BayesNetwork, *args, **kwargs):
+        key = (method.__name__, self.evidenceVersion, Freeze(args), Freeze(kwargs))
+        # The cache is read once, since an evidence change on another thread may replace it at any time
+        result = self._queryCache.get(key)
+        if result is None:
+            result = method(self, *args, **kwargs)
+            self._queryCache[key] = result
+        return CopyResult(result)
+    return Wrapper
 
 class BayesNetwork:
     """
@@ -15,17 +178,20 @@ class BayesNetwork:
     - nodesCPT: A dictionary representing the CPT for nodes.
     - bn: A directed graph representing the Bayesian network.
     - evidence: A dictionary representing the evidence for inference.
+    - dtype: The floating-point type of the CPT tables used for inference, float32 by default.
 
     Methods:
     - EnumerationAsk: Performs inference using the enumeration-ask algorithm.
     - EnumerationAll: Performs inference using the enumeration-all algorithm.
+    - EliminationAsk: Performs inference using the variable-elimination algorithm.
     - Probability: Calculates the probability of a variable given evidence.
     - VarCPT: Returns the CPT for a given variable.
     - Parent: Returns the parent nodes of a given node in the Bayesian network.
     - Normalize: Normalizes a dictionary of probabilities.
     """
 
-    def __init__(self, season: dict[str, list[float]], fragEdgesCPT: dict[Edge, float], nodesCPT: dict[Node, float], x: int, y: int):
+    def __init__(self, season: dict[str, list[float]], fragEdgesCPT: dict[Edge, float], nodesCPT: dict[Node, float], x: int, y: int,
+                 dtype: np.dtype = np.float32):
         self._season = season
         self._fragEdgesCPT = fragEdgesCPT
         self._nodesCPT = nodesCPT
@@ -37,8 +203,111 @@ class BayesNetwork:
         self._bn.add_nodes_from(fragEdges)
         self._bn.add_nodes_from(nodes)
         self._bn.add_edges_from([("season", node) for node in nodes])
-        self._bn.add_edges_from([(node, edge) for node in nodes for edge in fragEdges if node in edge])
+        # Every fragile edge depends on exactly its two endpoints
+        self._bn.add_edges_from([(node, edge) for edge in fragEdges for node in edge])
         self._evidence: dict[BNNode, bool | str] = {}
+        self._topoOrder: tuple[BNNode, ...] = tuple(nx.topological_sort(self._bn))
+        self._topoIndex: dict[BNNode, int] = {node: i for i, node in enumerate(self._topoOrder)}
+        self._ancestors: dict[BNNode, frozenset[BNNode]] = {node: frozenset(nx.ancestors(self._bn, node))
+                                                            for node in self._topoOrder}
+        self._nodeKind: dict[BNNode, int] = {node: SEASON_KIND if node == 'season' else
+                                             VERTEX_KIND if isinstance(node[0], int) else EDGE_KIND
+                                             for node in self._topoOrder}
+        self._dtype = np.dtype(dtype)
+        self._evidenceVersion = 0
+        self._queryCache: dict[tuple, object] = {}
+        self._relevantCache: dict[frozenset[BNNode], frozenset[BNNode]] = {}
+        self._allSimplePathsEdges: list[list[Edge]] | None = None
+        self._pathsCache: dict[tuple[Node, Node, int | None], list[list[Edge]]] = {}
+        self._layoutCache: dict[tuple[float, float], dict[BNNode, tuple[float, float]]] = {}
+        self.CompileCPTs()
+        # A node whose CPT is all zeros can never be True, so it is not offered as evidence
+        for node in self._bn.nodes:
+            self._bn.nodes[node]['populated'] = node == 'season' or any(self.VarCPT(node).values())
+        self._populatedNodes: list[BNNode] = [node for node, populated in self._bn.nodes(data='populated') if populated]
+        self._referencedCache: dict[tuple[BNNode, ...], frozenset[BNNode]] = {}
+        self._enumerationAllCache = ft.lru_cache(maxsize=ENUMERATION_CACHE_SIZE)(self.EnumerateAllFrozen)
+        self._cptLabels: dict[BNNode, str] = {node: '\n'.join([f"{k}: {v[0] if isinstance(v, list) else v}"
+                                                                for k, v in self.VarCPT(node).items()])
+                                              for node in self._bn.nodes}
+
+    def CompileCPTs(self) -> None:
+        """
+        Converts the CPT dictionaries into NumPy tables and packs them into flat arrays for the enumeration kernel.
+
+        The table of a variable holds P(v = x | parents) with one axis per parent followed by the variable's own axis,
+        each ordered as the variable's domain. Every variable's integer id is its index in the topological order,
+        and its table is stored raveled at cptFlat[cptOffset[v]:], so P(v = x | parents) is at
+        cptFlat[cptOffset[v] + row * sizes[v] + x], where row is the mixed-radix index of the parents' values.
+        The tables use the network's dtype, float32 by default, while results are normalized in float64.
+
+        The CPT dictionaries are first packed into dense arrays keyed by integer ids: row vertexIds[v] of
+        vertexCPTArray holds P(v = True | season) per season, and row edgeIds[f] of edgeCPTArray holds
+        P(f = True | a, b) at column 2 * a + b, where a and b are the domain indices of the endpoints
+        edgeEndpoints[edgeIds[f]] (True is 0). The tables of the vertices and edges are built from these arrays.
+        """
+        vertices = [node for node in self._topoOrder if self._nodeKind[node] == VERTEX_KIND]
+        edges = [node for node in self._topoOrder if self._nodeKind[node] == EDGE_KIND]
+        self._vertexIds: dict[Node, int] = {node: i for i, node in enumerate(vertices)}
+        self._edgeIds: dict[Edge, int] = {node: i for i, node in enumerate(edges)}
+        self._vertexCPTArray = np.array([[self._nodesCPT[node][s] for s in self.Domain('season')] for node in vertices],
+                                        dtype=self._dtype).reshape(-1, 3)
+        self._edgeCPTArray = np.array([[self._fragEdgesCPT[node][(a, b)] for a in (True, False) for b in (True, False)]
+                                       for node in edges], dtype=self._dtype).reshape(-1, 4)
+        self._edgeEndpoints = np.array([[self._vertexIds[node[0]], self._vertexIds[node[1]]] for node in edges],
+                                       dtype=np.int32).reshape(-1, 2)
+
+        self._cptTables: dict[BNNode, tuple[tuple[BNNode, ...], np.ndarray]] = {}
+        for node in self._topoOrder:
+            if node == 'season':
+                parents, table = (), np.array([self._season[s][0] for s in self.Domain(node)], dtype=self._dtype)
+            else:
+                if node in self._vertexIds:
+                    parents, pTrue = ('season',), self._vertexCPTArray[self._vertexIds[node]]
+                else:
+                    parents, pTrue = (node[0], node[1]), self._edgeCPTArray[self._edgeIds[node]].reshape(2, 2)
+                table = np.stack([pTrue, 1 - pTrue], axis=-1)
+            self._cptTables[node] = (parents, table)
+        self._varParents = {node: parents for node, (parents, _) in self._cptTables.items()}
+        # (P(v = True | season), P(v = False | season)) of every vertex, one flat lookup per season
+        self._seasonConditioned: dict[str, dict[Node, tuple[float, float]]] = {
+            s: {node: tuple(self._cptTables[node][1][j].tolist()) for node in vertices}
+            for j, s in enumerate(self.Domain('season'))}
+        # (P(f = True | a, b), P(f = False | a, b)) of every edge keyed by its endpoints' values, and the season prior
+        self._edgeConditioned: dict[Edge, dict[tuple[bool, bool], tuple[float, float]]] = {
+            node: {(a, b): tuple(self._cptTables[node][1][i, j].tolist())
+                   for i, a in enumerate((True, False)) for j, b in enumerate((True, False))}
+            for node in edges}
+        self._seasonPrior: dict[str, float] = dict(zip(self.Domain('season'), self._cptTables['season'][1].tolist()))
+
+        sizes = np.array([len(self.Domain(node)) for node in self._topoOrder], dtype=np.int64)
+        children: dict[BNNode, list[tuple[int, int]]] = {node: [] for node in self._topoOrder}
+        for node in self._topoOrder:
+            parents, table = self._cptTables[node]
+            for i, parent in enumerate(parents):
+                children[parent].append((self._topoIndex[node], int(np.prod(table.shape[i + 1:-1]))))
+        childPtr = np.cumsum([0] + [len(children[node]) for node in self._topoOrder], dtype=np.int64)
+        childIds = np.array([c for node in self._topoOrder for c, _ in children[node]], dtype=np.int64)
+        childStrides = np.array([stride for node in self._topoOrder for _, stride in children[node]], dtype=np.int64)
+        tables = [self._cptTables[node][1].ravel() for node in self._topoOrder]
+        cptOffset = np.cumsum([0] + [table.size for table in tables[:-1]], dtype=np.int64)
+        self._cptArrays = (sizes, childPtr, childIds, childStrides, cptOffset, np.concatenate(tables))
+
+    def PackEvidence(self, e: dict[BNNode, bool | str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Packs an evidence dictionary into the value-index and observed-mask arrays used by the enumeration kernel.
+
+        Args:
+        - e: The evidence for inference.
+
+        Returns:
+        The value index of every variable (-1 when not observed) and the observed mask.
+        """
+        values = np.full(len(self._topoIndex), -1, dtype=np.int64)
+        for node, value in e.items():
+            node = self.Canonical(node)
+            if node in self._topoIndex: values[self._topoIndex[node]] = self.Domain(node).index(value)
+        return values, values >= 0
 
     @property
     def bn(self) -> nx.DiGraph:
@@ -60,6 +329,26 @@ class BayesNetwork:
         """
         return self._grid
     
+    @property
+    def topoOrder(self) -> tuple[BNNode, ...]:
+        """
+        Returns the nodes of the Bayesian network in topological order, computed once since the graph is static.
+
+        Returns:
+            tuple[BNNode, ...]: The nodes in topological order.
+        """
+        return self._topoOrder
+
+    @property
+    def populatedNodes(self) -> list[BNNode]:
+        """
+        Returns the nodes that can be observed, i.e. the season and every node whose CPT is not all zeros.
+
+        Returns:
+            list[BNNode]: The populated nodes, in the order of the graph's nodes.
+        """
+        return self._populatedNodes
+
     @property
     def season(self) -> dict[str, list[float]]:
         """
@@ -94,6 +383,37 @@ class BayesNetwork:
         """
         return self._nodesCPT
 
+    @property
+    def dtype(self) -> np.dtype:
+        """
+        Returns the floating-point type of the CPT tables used for inference.
+
+        Returns:
+            np.dtype: The dtype of the CPT tables.
+        """
+        return self._dtype
+
+    @property
+    def cptTables(self) -> dict[BNNode, tuple[tuple[BNNode, ...], np.ndarray]]:
+        """
+        Returns the CPT of each node as a NumPy table, used by the inference algorithms.
+
+        Returns:
+            dict[BNNode, tuple[tuple[BNNode, ...], np.ndarray]]: A dictionary mapping each node to its parents and
+            its table of P(node | parents), with one axis per parent followed by the node's axis.
+        """
+        return self._cptTables
+
+    @property
+    def cptLabels(self) -> dict[BNNode, str]:
+        """
+        Returns the display labels of the CPT of each node, formatted once when the network is built.
+
+        Returns:
+            dict[BNNode, str]: A dictionary mapping each node to its CPT label, one line per CPT entry.
+        """
+        return self._cptLabels
+
     @property
     def evidence(self) -> dict[BNNode, bool | str]:
         """
@@ -105,6 +425,27 @@ class BayesNetwork:
         """
         return self._evidence
 
+    @property
+    def evidenceVersion(self) -> int:
+        """
+        Returns the evidence version, which is bumped every time the evidence changes.
+
+        Returns:
+            int: The evidence version.
+        """
+        return self._evidenceVersion
+
+    def SetEvidence(self, node: BNNode, value: bool | str) -> None:
+        """
+        Sets the observed value of a node and invalidates the cached query results.
+
+        Args:
+            node (BNNode): The observed node.
+            value (bool | str): The observed value.
+        """
+        self._evidence[node] = value
+        self.BumpEvidenceVersion()
+
     def ClearEvidence(self) -> None:
         """
         Clears all the evidence in the Bayesian network.
@@ -113,11 +454,22 @@ class BayesNetwork:
         effectively removing all the evidence that has been previously set.
         """
         self._evidence = {}
+        self.BumpEvidenceVersion()
+
+    def BumpEvidenceVersion(self) -> None:
+        """
+        Bumps the evidence version and drops the query results cached for the previous versions.
+        """
+        self._evidenceVersion += 1
+        self._queryCache = {}
 
     def HierarchicalLayout(self, width=2, vertGap=0.3) -> dict[BNNode, tuple[float, float]]:
         """
         Calculates the positions of nodes in a hierarchical layout for a Bayesian network.
 
+        The layout only depends on the graph, which does not change once the network is built,
+        so it is computed once per spacing and shared between calls without ever being invalidated.
+
         Parameters:
         - width (float): The horizontal spacing between nodes in the second layer. Default is 2.
         - vertGap (float): The vertical spacing between layers. Default is 0.3.
@@ -126,6 +478,7 @@ class BayesNetwork:
         - pos (dict): A dictionary containing the positions of nodes in the layout.
             The keys are node names and the values are (x, y) coordinates.
         """
+        if (width, vertGap) in self._layoutCache: return self._layoutCache[(width, vertGap)]
 
         pos = {}
         pos['season'] = (0, 0)  # Place root at the top
@@ -145,33 +498,88 @@ class BayesNetwork:
             pos[node] = (-width/2 + i * (width / (len(self.bn.nodes) - len(secondLayerNodes) - 2)), -2 * vertGap)
             i += 1
 
+        self._layoutCache[(width, vertGap)] = pos
         return pos
+
     def AllSimplePathsEdges(self) -> list[list[Edge]]:
         """
         Finds all simple paths between all nodes in the Bayes Network.
 
+        The paths depend only on the grid, so they are computed once and shared between calls.
+        A single search per source finds the paths to all targets, which are also cached for
+        AllSimplePathsStartToEndEdges.
+
         Returns:
             list[list[Edge]]: A list of lists of nodes representing the paths between all nodes.
-
         """
-        allPathsNodes = sum([self.AllSimplePathsStartToEndEdges(start, end) for start in self.grid.nodes for end in self.grid.nodes if start != end], [])
-        return allPathsNodes
+        if self._allSimplePathsEdges is None:
+            adjacency = {node: tuple(self.grid[node]) for node in self.grid.nodes}
+            sources = list(self.grid.nodes)
+            pathsFromSources = [SimplePathsFromSource(adjacency, start) for start in sources]
+            for start, paths in zip(sources, pathsFromSources):
+                for end, pathsToEnd in paths.items():
+                    self._pathsCache.setdefault((start, end, None), pathsToEnd)
+            self._allSimplePathsEdges = [path for paths in pathsFromSources for end in sources if end in paths
+                                         for path in paths[end]]
+        return self._allSimplePathsEdges
     
-    def AllSimplePathsStartToEndEdges(self, start: Node, end: Node) -> list[list[Edge]]:
+    def AllSimplePathsStartToEndEdges(self, start: Node, end: Node, cutoff: int | None = None) -> list[list[Edge]]:
         """
         Finds all simple paths between two nodes in the Bayes Network.
 
+        The grid does not change, so the paths are cached per start, end and cutoff and shared between calls.
+
         Args:
             start (Node): The starting node of the path.
             end (Node): The ending node of the path.
+            cutoff (int | None): The maximum number of edges in a path, no limit when None.
 
         Returns:
-            list[list[Node]]: A list of lists of nodes representing the paths from start to end.
+            list[list[Edge]]: A list of lists of edges representing the paths from start to end.
+
+        """
+        if (start, end, cutoff) not in self._pathsCache:
+            self._pathsCache[(start, end, cutoff)] = list(self.IterSimplePathsStartToEndEdges(start, end, cutoff))
+        return self._pathsCache[(start, end, cutoff)]
 
+    def IterSimplePathsStartToEndEdges(self, start: Node, end: Node, cutoff: int | None = None) -> Iterator[list[Edge]]:
         """
-        allPathsNodes = list(nx.all_simple_paths(self.grid, start, end))
-        allPathEdges = [[(allPathsNodes[i][j], allPathsNodes[i][j + 1]) for j in range(len(allPathsNodes[i]) - 1)] for i in range(len(allPathsNodes))]
-        return allPathEdges
+        Yields the simple paths between two nodes in the Bayes Network one at a time, without caching them.
+
+        The paths are found with an iterative depth-first search over the grid that builds the edge lists directly,
+        in the same order as nx.all_simple_paths.
+
+        Args:
+            start (Node): The starting node of the path.
+            end (Node): The ending node of the path.
+            cutoff (int | None): The maximum number of edges in a path, no limit when None.
+
+        Yields:
+            list[Edge]: The edges of the next path from start to end.
+        """
+        if start == end:
+            yield []
+            return
+        maxLength = len(self.grid) - 1 if cutoff is None else cutoff
+        pathNodes = [start]
+        pathEdges: list[Edge] = []
+        visited = {start}
+        stack = [iter(self.grid[start])]
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
+                visited.discard(pathNodes.pop())
+                if pathEdges: pathEdges.pop()
+            elif node in visited:
+                continue
+            elif node == end:
+                if len(pathEdges) + 1 <= maxLength: yield pathEdges + [(pathNodes[-1], node)]
+            elif len(pathEdges) + 1 < maxLength:
+                pathEdges.append((pathNodes[-1], node))
+                pathNodes.append(node)
+                visited.add(node)
+                stack.append(iter(self.grid[node]))
 
     def FindNonBlockedPath(self, start: Node, end: Node, e: dict[BNNode, bool | str]) -> list[Node]:
         """
@@ -188,38 +596,61 @@ class BayesNetwork:
         """
         # allPathsNodes = list(nx.all_simple_paths(self.grid, start, end))
         # allPathEdges = [[(allPathsNodes[i][j], allPathsNodes[i][j + 1]) for j in range(len(allPathsNodes[i]) - 1)] for i in range(len(allPathsNodes))]
-        allPathEdges = self.AllSimplePathsStartToEndEdges(start, end)
-        print(f'{allPathEdges=}')
+        # The paths are scored one at a time, so they are streamed unless they were already found
+        allPathEdges = self._pathsCache.get((start, end, None)) or self.IterSimplePathsStartToEndEdges(start, end)
         highProb = (0, [])
+        # A path's probability only depends on its set of fragile edges, which overlapping paths often share
+        setProbabilities: dict[frozenset[BNNode], float] = {}
         for path in allPathEdges:
-            currPathProb = (self.EnumerationAskSet(path, e | {}), path)
-            print(f'{currPathProb=}')
+            fragile = frozenset(edge for edge in map(self.Canonical, path) if edge in self.bn.nodes)
+            if fragile not in setProbabilities:
+                setProbabilities[fragile] = self.EliminationAskSet(sorted(fragile), e)
+            currPathProb = (setProbabilities[fragile], path)
             highProb = max(highProb, currPathProb, key=lambda x: (x[0], -len(x[1])))
         return highProb
 
+    @MemoizedQuery
     def EnumerationAskSet(self, querySet: list[BNNode], e: dict[BNNode, bool | str]) -> float:
         """
-        Performs enumeration-based inference for all queries in the Bayesian network.
+        Computes the probability that all the query variables are False given the evidence, by enumeration.
+
+        The probability is computed as P(querySet = False, e) / P(e) from two enumerations over the
+        non-barren nodes, instead of chaining one query per variable. The query edges are leaves, so P(e)
+        is enumerated without them, and it is not enumerated at all when there is no relevant evidence.
 
         Args:
+            querySet (list[BNNode]): The query variables, usually the edges of a path.
             e (dict): Evidence dictionary containing observed values for nodes or edges in the network.
 
         Returns:
-            dict: A dictionary containing the probabilities of all queries in the network.
-                  The keys are the queries (nodes or edges) and the values are dictionaries
-                  representing the probability distribution for each query.
+            float: The probability that none of the query variables is True.
         """
-        if len(querySet) == 0: return 1.0
-        print(f'{querySet=}, {e=}', '\n')
-        p = self.EnumerationAsk([querySet[0]], e | {})
-        pFalse = p[False]
-        print(f'{querySet=}, {e=}, {p=}, {pFalse=}', '\n\n')
-        return round(pFalse * self.EnumerationAskSet(querySet[1:], e | {querySet[0]: False}), ROUND_DIGITS)
+        e = {self.Canonical(k): v for k, v in e.items()}
+        # Edges that are not in the network are never blocked
+        query = list(dict.fromkeys(q for q in map(self.Canonical, querySet) if q in self.bn.nodes))
+        if any(e.get(q) is True for q in query): return 0.0
+        # Edges observed as not blocked contribute a factor of 1, even when the evidence is impossible
+        query = [q for q in query if q not in e]
+        if not query: return 1.0
+        nodes = self.RemoveBarrenNodes(query, e)
+        # e is a local copy, so the query values are set in place and removed again instead of copying it
+        added = [q for q in query if q not in e]
+        e.update(dict.fromkeys(added, False))
+        pQuery = self.EnumerationAll(nodes, e)
+        for q in added: del e[q]
+        # Unobserved query leaves (the path edges) sum out to 1 in P(e), and without evidence P(e) is 1
+        evidenceNodes = [node for node in nodes if node in e or node not in query or self.bn.out_degree(node) > 0]
+        pEvidence = self.EnumerationAll(evidenceNodes, e) if any(node in e for node in evidenceNodes) else 1.0
+        if pEvidence == 0: return 0.0
+        return pQuery / pEvidence
 
+    @MemoizedQuery
     def EnumerationAskAll(self, e: dict[BNNode, bool | str]) -> dict[BNNode, dict[bool | str , float]]:
         """
         Performs enumeration-based inference for all queries in the Bayesian network.
 
+        Without evidence on the edges, all the marginals are computed in one forward sweep by ForwardMarginals.
+
         Args:
             e (dict): Evidence dictionary containing observed values for nodes or edges in the network.
 
@@ -228,10 +659,65 @@ class BayesNetwork:
                   The keys are the queries (nodes or edges) and the values are dictionaries
                   representing the probability distribution for each query.
         """
-        queries = list(nx.topological_sort(self.bn))
-        probabilityDict = {q: cp.deepcopy(self).EnumerationAsk([q], cp.copy(e)) for q in queries}
+        queries = self._topoOrder
+        if not any(self._nodeKind.get(self.Canonical(node)) == EDGE_KIND for node in e):
+            return self.ForwardMarginals(e)
+        # EnumerationAsk works on its own canonical copy of the evidence, so it is not copied per query
+        probabilityDict = {q: self.EnumerationAsk([q], e) for q in queries}
         return probabilityDict
 
+    def ForwardMarginals(self, e: dict[BNNode, bool | str]) -> dict[BNNode, dict[bool | str , float]]:
+        """
+        Computes the marginals of all the variables in one forward sweep, given evidence on the season and vertices.
+
+        The vertices are independent given the season, so the evidence only updates the season's distribution,
+        every vertex marginal is linear in it and every edge marginal is bilinear in its endpoints' marginals
+        given the season. The sweep is vectorized over the dense vertex and edge CPT arrays.
+        This is exact only when no edge is observed, since an observed edge couples its endpoints.
+
+        Args:
+            e (dict): Evidence dictionary containing observed values for the season or vertices.
+
+        Returns:
+            dict: The probability distribution of every variable, as returned by EnumerationAsk.
+        """
+        e = {self.Canonical(k): v for k, v in e.items() if self.Canonical(k) in self._nodeKind}
+        seasons = self.Domain('season')
+        # P(v = True | season, e) for every vertex, with observed vertices fixed to their value
+        vertexTrue = self._vertexCPTArray.astype(np.float64)
+        joint = self._cptTables['season'][1].astype(np.float64)
+        if 'season' in e: joint = joint * (np.array(seasons) == e['season'])
+        for node, value in e.items():
+            if self._nodeKind[node] != VERTEX_KIND: continue
+            i = self._vertexIds[node]
+            # An observed season separates the other variables from the vertex evidence
+            if 'season' not in e: joint = joint * (vertexTrue[i] if value else 1 - vertexTrue[i])
+            vertexTrue[i] = 1.0 if value else 0.0
+        total = joint.sum()
+        seasonPosterior = joint / total if total > 0 else joint
+        a, b = vertexTrue[self._edgeEndpoints[:, 0]], vertexTrue[self._edgeEndpoints[:, 1]]
+        edgeCPT = self._edgeCPTArray.astype(np.float64)
+        edgeTrue = (edgeCPT[:, [0]] * a * b + edgeCPT[:, [1]] * a * (1 - b) +
+                    edgeCPT[:, [2]] * (1 - a) * b + edgeCPT[:, [3]] * (1 - a) * (1 - b))
+        # One matrix-vector product per kind, a NumPy call per 3-element row would cost more than the arithmetic
+        vertexMarginals, edgeMarginals = (vertexTrue @ seasonPosterior).tolist(), (edgeTrue @ seasonPosterior).tolist()
+        pTrue = {node: vertexMarginals[i] for node, i in self._vertexIds.items()}
+        pTrue |= {node: edgeMarginals[i] for node, i in self._edgeIds.items()}
+
+        probabilityDict = {}
+        for q in self._topoOrder:
+            options = self.Domain(q)
+            if q in e:
+                probabilityDict[q] = {e[q]: 1.0} | {other: 0.0 for other in options if other != e[q]}
+            elif total == 0:
+                probabilityDict[q] = {option: 0.0 for option in options}
+            elif q == 'season':
+                probabilityDict[q] = dict(zip(seasons, seasonPosterior.tolist()))
+            else:
+                probabilityDict[q] = {True: pTrue[q], False: 1 - pTrue[q]}
+        return probabilityDict
+
+    @MemoizedQuery
     def EnumerationAsk(self, query: BNNode, e: dict[BNNode, str | bool]) -> dict[str, float]:
         """
         Performs inference using the enumeration-ask algorithm.
@@ -246,20 +732,20 @@ class BayesNetwork:
         # from utils import PlotBN
         queryDict = {}
         # PlotBN(self)
-        query = [tuple(sorted(q)) if isinstance(q, tuple) and q and isinstance(q[0], tuple) else q for q in query][0]
+        query = self.Canonical(query[0])
+        e = {self.Canonical(k): v for k, v in e.items()}
         if query not in self.bn.nodes: return {True: 0.0, False: 1.0}
-        options = ['low', 'medium', 'high'] if isinstance(query, str) else [True, False]
+        options = self.Domain(query)
         if query in e:
             otherOptions = options[::]
             otherOptions.remove(e[query])
             return {e[query]: 1.0} | {other: 0.0 for other in otherOptions}
+        nodes = self.RemoveBarrenNodes([query], e)
         for q in options:
             e[query] = q
-            barrenBN = self.RemoveBarrenNodes(query, e | {})
-            # PlotBN(barrenBN)
-            nodes = list(nx.topological_sort(barrenBN.bn))
             # print(f'{query=}, {nodes=}, {e=}', '\n\n')
-            queryDict[q] = barrenBN.EnumerationAll(nodes, e | {})
+            queryDict[q] = self.EnumerationAll(nodes, e)
+        del e[query]
         return self.Normalize(queryDict)
 
     def EnumerationAll(self, nodes: list[Node], e: dict[BNNode, bool | str]) -> float:
@@ -273,25 +759,50 @@ class BayesNetwork:
         Returns:
         The probability of the evidence.
         """
-        import numpy as np
-
-        if len(nodes) == 0:
-            return 1.0
-        y = nodes[0]
-        if isinstance(y, tuple) and y and isinstance(y[0], tuple): y = tuple(sorted(y))
-        options = ['low', 'medium', 'high'] if isinstance(y, str) else [True, False]
-        if y in e:
-            p = self.Probability(y, e, e[y])
-            r = self.EnumerationAll(nodes[1:], e)
-            return p * r
-        p = [self.Probability(y, e, option) for option in options]
-        r = [self.EnumerationAll(nodes[1:], e | {y : option}) for option in options]
-        return np.inner(p, r)
+        nodes = tuple(self.Canonical(node) for node in nodes)
+        if nodes not in self._referencedCache:
+            self._referencedCache[nodes] = frozenset(nodes).union(*(self._varParents[node] for node in nodes))
+        referenced = self._referencedCache[nodes]
+        # Evidence on variables the nodes do not reference does not change the result, so it is left out of the key
+        canonicalEvidence = ((self.Canonical(node), value) for node, value in e.items())
+        frozenEvidence = frozenset((node, value) for node, value in canonicalEvidence if node in referenced)
+        return self._enumerationAllCache(nodes, frozenEvidence)
+
+    def EnumerateAllFrozen(self, nodes: tuple[BNNode, ...], e: frozenset[tuple[BNNode, bool | str]]) -> float:
+        """
+        Runs the enumeration kernel on canonical nodes and frozen evidence, memoized through EnumerationAll.
+
+        The CPT entry of an observed node whose parents are all observed is the same in every assignment
+        of the free variables, so it is multiplied in once and the node is left out of the kernel's loop.
+
+        Args:
+        - nodes: The canonical nodes to enumerate, in topological order.
+        - e: The evidence for inference as a frozenset of (node, value) pairs.
+
+        Returns:
+        The probability of the evidence.
+        """
+        e = dict(e)
+        constant = 1.0
+        enumerated = []
+        for node in nodes:
+            if node in e and all(parent in e for parent in self._varParents[node]):
+                constant *= self.Probability(node, e, e[node])
+            else:
+                enumerated.append(self._topoIndex[node])
+        if constant == 0.0: return 0.0
+        order = np.array(enumerated, dtype=np.int64)
+        values, fixed = self.PackEvidence(e)
+        return constant * float(CompiledEnumerateAllKernel()(order, values, fixed, *self._cptArrays))
 
     def Probability(self, y: BNNode, e: dict[BNNode, bool | str], option: str | bool) -> float:
         """
         Calculates the probability of a variable given evidence.
 
+        The value is read from the lookups precomputed from the compiled CPT tables, keyed by the values of
+        the variable's parents in the evidence, so no domain index is computed per call.
+        Vertices, which depend only on the season, are read from the season-conditioned lookups.
+
         Args:
         - y: The variable to calculate the probability for.
         - e: The evidence for inference.
@@ -300,10 +811,11 @@ class BayesNetwork:
         Returns:
         The probability of the variable given the evidence.
         """
-        if isinstance(y, str): return self.season[option][0]
-        if option:
-            return self.VarCPT(y)[self.Parent(y, e)]
-        return 1 - self.VarCPT(y)[self.Parent(y, e)]
+        kind = self._nodeKind.get(y)
+        if kind == VERTEX_KIND: return self._seasonConditioned[e['season']][y][0 if option else 1]
+        if kind == SEASON_KIND: return self._seasonPrior[option]
+        if kind is None: y = self.Canonical(y) # an edge given in the other direction
+        return self._edgeConditioned[y][(e[y[0]], e[y[1]])][0 if option else 1]
 
     def VarCPT(self, node: BNNode):
         """
@@ -315,8 +827,9 @@ class BayesNetwork:
         Returns:
         The CPT for the variable.
         """
-        if isinstance(node, str): return self.season
-        if isinstance(node, tuple) and node and isinstance(node[0], int): return self._nodesCPT[node]
+        kind = self._nodeKind.get(node, EDGE_KIND)
+        if kind == SEASON_KIND: return self.season
+        if kind == VERTEX_KIND: return self._nodesCPT[node]
         return self._fragEdgesCPT[node]
 
     def Parent(self, node: BNNode, e: dict[BNNode, bool | str]):
@@ -330,8 +843,9 @@ class BayesNetwork:
         Returns:
         The parent nodes of the given node.
         """
-        if node == "season": return 0
-        if isinstance(node, tuple) and node and isinstance(node[0], int): return e['season']
+        kind = self._nodeKind.get(node, EDGE_KIND)
+        if kind == SEASON_KIND: return 0
+        if kind == VERTEX_KIND: return e['season']
         return (e[node[0]], e[node[1]])
 
     def Normalize(self, queryDict: dict[str, float]) -> dict[str, float]:
@@ -347,23 +861,324 @@ class BayesNetwork:
         sumQ = sum(queryDict.values())
         # print(f'{queryDict=}, {sumQ=}', '\n\n')
         if sumQ == 0: return queryDict
-        return {k: round(v/sumQ, ROUND_DIGITS) for k, v in queryDict.items()}
+        return {k: v/sumQ for k, v in queryDict.items()}
 
-    def RemoveBarrenNodes(self, query: list[BNNode], e: dict[Node | Edge | str, bool | str]) -> BayesNetwork:
+    def RelevantNodes(self, nodes: list[BNNode]) -> frozenset[BNNode]:
         """
-        Removes barren nodes from the Bayesian network.
+        Returns the given nodes together with all their ancestors, the only nodes relevant to a query on them.
+
+        The ancestors of every node are computed once with the network, and the result is cached per set of nodes,
+        since the GUI repeats the same queries.
+
+        Args:
+        - nodes: The query and evidence nodes.
+
+        Returns:
+        The nodes and their ancestors in the Bayesian network.
+        """
+        key = frozenset(node for node in nodes if node in self._ancestors)
+        if key not in self._relevantCache:
+            self._relevantCache[key] = key.union(*(self._ancestors[node] for node in key))
+        return self._relevantCache[key]
+
+    def RemoveBarrenNodes(self, query: list[BNNode], e: dict[Node | Edge | str, bool | str]) -> list[BNNode]:
+        """
+        Returns the nodes of the Bayesian network that are not barren for the query and evidence, in topological order.
+
+        These are the query, the evidence and their ancestors, without the evidence nodes whose ancestors are all
+        evidence, as those only scale the result by a constant. They are read off the precomputed ancestor sets,
+        so the network is neither copied nor pruned.
+
+        Args:
+        - query: The query variables.
+        - e: The evidence for inference.
+
+        Returns:
+        The nodes to enumerate for the query.
         """
         if not isinstance(query, list): query = [query] # convert query to list if it is not
-        newBN = cp.deepcopy(self)
-        nodes = list(nx.topological_sort(self.bn))
-        # print(f'{query=}, {nodes=}, {e=}')
-        for node in nodes:
-            if newBN.bn.in_degree(node) == 0 and node in e and node not in query:
-                # print(f'{node=}, {newBN.bn.in_degree(node)=}')
-                newBN.bn.remove_node(node)
-        for node in nodes[::-1]:
-            if node not in newBN.bn.nodes: continue # if node was already removed, continue
-            if newBN.bn.out_degree(node) == 0 and node not in e and node not in query:
-                # print(f'{node=}, {newBN.bn.out_degree(node)=}')
-                newBN.bn.remove_node(node)
-        return newBN
+        relevant = self.RelevantNodes([*query, *e])
+        observedRoots = {node for node in relevant if node in e and node not in query
+                         and all(a in e and a not in query for a in self._ancestors[node])}
+        return [node for node in self._topoOrder if node in relevant and node not in observedRoots and node in self.bn]
+
+    @staticmethod
+    def Canonical(node: BNNode) -> BNNode:
+        """
+        Returns the canonical form of a node in the Bayesian network.
+
+        Edges are stored with their endpoints sorted, so an edge given in either direction is mapped to the same node.
+
+        Args:
+        - node: The node to canonicalize.
+
+        Returns:
+        The canonical node.
+        """
+        if isinstance(node, tuple) and node and isinstance(node[0], tuple): return tuple(sorted(node))
+        return node
+
+    @staticmethod
+    def Domain(node: BNNode) -> list[bool | str]:
+        """
+        Returns the possible values of a variable.
+
+        Args:
+        - node: The variable to get the domain for.
+
+        Returns:
+        The list of values the variable can take.
+        """
+        return ['low', 'medium', 'high'] if isinstance(node, str) else [True, False]
+
+    def Factor(self, node: BNNode, e: dict[BNNode, bool | str]) -> tuple[tuple[BNNode, ...], np.ndarray]:
+        """
+        Builds the CPT factor of a variable with the evidence instantiated.
+
+        Args:
+        - node: The variable whose CPT is turned into a factor.
+        - e: The evidence for inference.
+
+        Returns:
+        A tuple of the factor variables and the factor table, with one axis per variable ordered as the domain.
+        """
+        parents, table = self._cptTables[node]
+        variables = parents + (node,)
+        index = tuple(self.Domain(v).index(e[v]) if v in e else slice(None) for v in variables)
+        return tuple(v for v in variables if v not in e), table[index]
+
+    @staticmethod
+    def SumProduct(factors: list[tuple[tuple[BNNode, ...], np.ndarray]],
+                   keep: list[BNNode]) -> tuple[tuple[BNNode, ...], np.ndarray]:
+        """
+        Pointwise multiplies factors and sums out every variable not in keep.
+
+        Args:
+        - factors: The factors to multiply.
+        - keep: The variables of the resulting factor.
+
+        Returns:
+        The resulting factor.
+        """
+        if not factors: return (), np.array(1.0)
+        axes = {v: i for i, v in enumerate(dict.fromkeys(v for variables, _ in factors for v in variables))}
+        operands = []
+        for variables, table in factors:
+            operands += [table, [axes[v] for v in variables]]
+        return tuple(keep), np.einsum(*operands, [axes[v] for v in keep])
+
+    @staticmethod
+    def MinFillOrder(hidden: list[BNNode], factors: list[tuple[tuple[BNNode, ...], np.ndarray]]) -> list[BNNode]:
+        """
+        Computes an elimination order using the greedy min-fill heuristic.
+
+        Args:
+        - hidden: The variables to eliminate.
+        - factors: The factors the variables appear in.
+
+        Returns:
+        The elimination order.
+        """
+        neighbours = {v: set() for variables, _ in factors for v in variables}
+        for variables, _ in factors:
+            for v in variables:
+                neighbours[v] |= set(variables) - {v}
+        order, remaining = [], set(hidden)
+        while remaining:
+            z = min(remaining, key=lambda v: (sum(1 for a, b in it.combinations(neighbours[v], 2)
+                                                  if b not in neighbours[a]), str(v)))
+            for a, b in it.combinations(neighbours[z], 2):
+                neighbours[a].add(b)
+                neighbours[b].add(a)
+            for v in neighbours.pop(z):
+                neighbours[v].discard(z)
+            remaining.remove(z)
+            order.append(z)
+        return order
+
+    def EliminateHidden(self, query: list[BNNode], e: dict[BNNode, bool | str],
+                        order: list[BNNode] | None = None) -> tuple[tuple[BNNode, ...], np.ndarray]:
+        """
+        Sums every hidden variable out of the factors relevant to the query.
+
+        As in RemoveBarrenNodes, the evidence nodes whose ancestors are all evidence are left out, since their factors
+        are constants. This keeps the enumeration results under evidence whose probability is 0 given its ancestors.
+
+        Args:
+        - query: The canonical variables to query.
+        - e: The canonical evidence for inference, restricted to variables of the network.
+        - order: The elimination order of the hidden variables, min-fill is used when not given.
+
+        Returns:
+        The unnormalized factor over the query variables that are in the network and not observed.
+        """
+        bnQuery = [q for q in query if q in self.bn.nodes]
+        relevant = self.RemoveBarrenNodes(bnQuery, e)
+        factors = [self.Factor(node, e) for node in relevant]
+        hidden = [node for node in relevant if node not in e and node not in bnQuery]
+        order = self.MinFillOrder(hidden, factors) if order is None else \
+            [z for z in map(self.Canonical, order) if z in hidden] + [z for z in hidden if z not in order]
+        for z in order:
+            related = [f for f in factors if z in f[0]]
+            keep = [v for v in dict.fromkeys(v for variables, _ in related for v in variables) if v != z]
+            factors = [f for f in factors if z not in f[0]] + [self.SumProduct(related, keep)]
+        return self.SumProduct(factors, [q for q in bnQuery if q not in e])
+
+    @MemoizedQuery
+    def EliminationAsk(self, query: list[BNNode], e: dict[BNNode, bool | str],
+                       order: list[BNNode] | None = None) -> dict[tuple[bool | str, ...], float]:
+        """
+        Performs inference using the variable-elimination algorithm.
+
+        Args:
+        - query: The variables to query.
+        - e: The evidence for inference.
+        - order: The elimination order of the hidden variables, min-fill is used when not given.
+
+        Returns:
+        A dictionary containing the joint probabilities of the query variables,
+        keyed by the tuple of their values in query order.
+        """
+        query = list(dict.fromkeys(self.Canonical(q) for q in query))
+        e = {self.Canonical(k): v for k, v in e.items() if self.Canonical(k) in self.bn.nodes}
+        if all(q in e for q in query):
+            # As in EnumerationAsk, an observed query is certain to have its observed value
+            return {values: float(values == tuple(e[q] for q in query))
+                    for values in it.product(*(self.Domain(q) for q in query))}
+        free, table = self.EliminateHidden(query, e, order)
+        queryDict = {}
+        for values in it.product(*(self.Domain(q) for q in query)):
+            assignment = dict(zip(query, values))
+            if any(assignment[q] != e.get(q, False) for q in query if q not in free):
+                queryDict[values] = 0.0
+                continue
+            queryDict[values] = float(table[tuple(self.Domain(q).index(assignment[q]) for q in free)])
+        return self.Normalize(queryDict)
+
+    @MemoizedQuery
+    def EliminationAskAll(self, e: dict[BNNode, bool | str]) -> dict[BNNode, dict[bool | str , float]]:
+        """
+        Performs variable-elimination inference for every variable in the Bayesian network.
+
+        Args:
+        - e: The evidence for inference.
+
+        Returns:
+        A dictionary mapping each variable to its probability distribution given the evidence.
+        """
+        return {q: {k[0]: v for k, v in self.EliminationAsk([q], e).items()} for q in self._topoOrder}
+
+    @MemoizedQuery
+    def EliminationAskAllJoint(self, e: dict[BNNode, bool | str]) -> dict[BNNode, dict[bool | str , float]]:
+        """
+        Performs variable-elimination inference for every variable in the Bayesian network with a single shared pass.
+
+        The hidden variables are eliminated once, leaving the joint over the unobserved ancestors of the evidence.
+        Every other variable is independent of the evidence given its parents, so its marginal is read off by
+        multiplying that joint with the CPTs of the variable and its ancestors outside of it.
+
+        Args:
+        - e: The evidence for inference.
+
+        Returns:
+        A dictionary mapping each variable to its probability distribution given the evidence.
+        """
+        e = {self.Canonical(k): v for k, v in e.items() if self.Canonical(k) in self.bn.nodes}
+        joint = [node for node in self._topoOrder if node in self.RelevantNodes(list(e)) and node not in e]
+        if len(joint) > MAX_BATCH_JOINT_VARS: return self.EliminationAskAll(e)
+        jointFactor = self.EliminateHidden(joint, e)
+        probabilityDict = {}
+        for q in self._topoOrder:
+            if q in e:
+                probabilityDict[q] = {value: float(value == e[q]) for value in self.Domain(q)}
+                continue
+            factors = [jointFactor] + [self.Factor(node, e) for node in self.RelevantNodes([q]) - set(joint) - set(e)]
+            _, table = self.SumProduct(factors, [q])
+            probabilityDict[q] = self.Normalize({value: float(p) for value, p in zip(self.Domain(q), table)})
+        return probabilityDict
+
+    @MemoizedQuery
+    def EvidenceProbability(self, e: dict[BNNode, bool | str], query: list[BNNode] | None = None) -> float:
+        """
+        Calculates the probability of the evidence using variable elimination.
+
+        Args:
+        - e: The evidence for inference.
+        - query: The observed query variables, whose factors are kept even when all their ancestors are observed.
+
+        Returns:
+        The probability of the evidence, summed over every variable relevant to it.
+        """
+        e = {self.Canonical(k): v for k, v in e.items() if self.Canonical(k) in self.bn.nodes}
+        _, table = self.EliminateHidden([self.Canonical(q) for q in query or []], e)
+        return float(table)
+
+    @MemoizedQuery
+    def EliminationAskSet(self, querySet: list[BNNode], e: dict[BNNode, bool | str]) -> float:
+        """
+        Calculates the probability that all the edges in querySet are not blocked using variable elimination.
+
+        As in EnumerationAskSet, the probability is computed as P(querySet = False, e) / P(e) with the query edges
+        added to the evidence, so the joint over the edges is never built.
+
+        Args:
+        - querySet: The edges to query.
+        - e: The evidence for inference.
+
+        Returns:
+        The probability that none of the edges is blocked given the evidence.
+        """
+        e = {self.Canonical(k): v for k, v in e.items() if self.Canonical(k) in self.bn.nodes}
+        # Edges that are not in the network are never blocked
+        query = list(dict.fromkeys(q for q in map(self.Canonical, querySet) if q in self.bn.nodes))
+        if any(e.get(q) is True for q in query): return 0.0
+        # Edges observed as not blocked contribute a factor of 1, even when the evidence is impossible
+        query = [q for q in query if q not in e]
+        if not query: return 1.0
+        pEvidence = self.EvidenceProbability(e)
+        if pEvidence == 0: return 0.0
+        return self.EvidenceProbability(e | dict.fromkeys(query, False), query) / pEvidence
+
+    def EliminationAskSetBatch(self, querySets: list[list[BNNode]], e: dict[BNNode, bool | str]) -> list[float]:
+        """
+        Calculates the probability that all the edges are not blocked for many edge sets with a single elimination pass.
+
+        The hidden variables are eliminated once, leaving the joint over the union of the queried edges,
+        which is then marginalized for each edge set.
+
+        Args:
+        - querySets: The edge sets to query, usually paths.
+        - e: The evidence for inference.
+
+        Returns:
+        The probability that none of the edges is blocked given the evidence, for each edge set in order.
+        """
+        e = {self.Canonical(k): v for k, v in e.items() if self.Canonical(k) in self.bn.nodes}
+        union = list(dict.fromkeys(self.Canonical(q) for querySet in querySets for q in querySet))
+        if len([q for q in union if q in self.bn.nodes and q not in e]) > MAX_BATCH_JOINT_VARS:
+            # The joint would be too large, so each set is computed as a ratio of evidence probabilities instead
+            return [self.EliminationAskSet(querySet, e) for querySet in querySets]
+        # Observed edges are left out of the query, so their factors are pruned as in EnumerationAskSet
+        free, table = self.EliminateHidden([q for q in union if q not in e], e)
+        table = table.astype(np.float64)
+        total = table.sum()
+        probabilities = []
+        # Paths that differ only in direction or in their non-fragile edges share the same set
+        setProbabilities: dict[frozenset[BNNode], float] = {}
+        for querySet in querySets:
+            querySet = frozenset(q for q in map(self.Canonical, querySet) if q in self.bn.nodes)
+            if querySet in setProbabilities:
+                probability = setProbabilities[querySet]
+            elif any(e.get(q, False) for q in querySet):
+                probability = 0.0
+            # Edges observed as not blocked contribute a factor of 1, even when the evidence is impossible
+            elif not querySet - set(e):
+                probability = 1.0
+            elif total == 0:
+                probability = 0.0
+            else:
+                index = tuple(1 if q in querySet else slice(None) for q in free) # index 1 is False in Domain
+                probability = float(np.sum(table[index]) / total)
+            setProbabilities[querySet] = probability
+            probabilities.append(probability)
+        return probabilities
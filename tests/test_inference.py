@@ -0,0 +1,146 @@
+import contextlib
+import glob
+import io
+import os
+import unittest
+import numpy as np
+from bayes_network import BayesNetwork
+from utils import InitBN
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# The CPT tables are float32, so results match the float64 brute force up to this tolerance
+TOLERANCE = 2e-5
+
+def LoadBN(filePath: str) -> BayesNetwork:
+    """
+    Loads a Bayes Network test file without printing its CPTs.
+
+    Args:
+        filePath (str): The path to the test file.
+
+    Returns:
+        BayesNetwork: The initialized Bayes Network.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        return InitBN(filePath)
+
+def BruteForceJoint(bn: BayesNetwork) -> tuple[list, np.ndarray]:
+    """
+    Builds the full joint distribution of a network from its CPT dictionaries, independently of the compiled tables.
+
+    Args:
+        bn (BayesNetwork): The Bayes Network.
+
+    Returns:
+        tuple[list, np.ndarray]: The variables, and the joint with one axis per variable ordered as its domain.
+    """
+    variables = list(bn.topoOrder)
+    axes = {v: i for i, v in enumerate(variables)}
+    seasons = bn.Domain('season')
+    operands = []
+    for node in variables:
+        if node == 'season':
+            parents, table = [], np.array([bn.season[s][0] for s in seasons])
+        elif node in bn.nodesCPT:
+            pTrue = np.array([bn.nodesCPT[node][s] for s in seasons])
+            parents, table = ['season'], np.stack([pTrue, 1 - pTrue], axis=-1)
+        else:
+            pTrue = np.array([[bn.fragEdgesCPT[node][(a, b)] for b in (True, False)] for a in (True, False)])
+            parents, table = list(node), np.stack([pTrue, 1 - pTrue], axis=-1)
+        operands += [table, [axes[v] for v in parents + [node]]]
+    return variables, np.einsum(*operands, list(range(len(variables))))
+
+def Condition(bn: BayesNetwork, variables: list, joint: np.ndarray, e: dict) -> np.ndarray:
+    """
+    Restricts the joint to the assignments consistent with the evidence, keeping every axis.
+
+    Args:
+        bn (BayesNetwork): The Bayes Network.
+        variables (list): The variables of the joint.
+        joint (np.ndarray): The joint distribution.
+        e (dict): The evidence.
+
+    Returns:
+        np.ndarray: The joint with the inconsistent assignments set to 0.
+    """
+    mask = np.ones(joint.shape, dtype=bool)
+    for i, v in enumerate(variables):
+        if v in e:
+            shape = [1] * joint.ndim
+            shape[i] = -1
+            mask &= (np.array(bn.Domain(v)) == e[v]).reshape(shape)
+    return joint * mask
+
+class TestInference(unittest.TestCase):
+    """
+    Checks the enumeration and variable-elimination queries against a brute-force joint over every test network.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.networks = {}
+        for filePath in sorted(glob.glob(os.path.join(TESTS_DIR, '*.txt'))):
+            bn = LoadBN(filePath)
+            variables, joint = BruteForceJoint(bn)
+            single = [{node: value} for node in bn.populatedNodes for value in bn.Domain(node)]
+            pairs = [a | b for i, a in enumerate(single) for b in single[i + 1:] if a.keys() != b.keys()]
+            evidences = [{}] + single + pairs[::7]
+            cls.networks[os.path.basename(filePath)] = (bn, variables, joint, evidences)
+
+    def Evidences(self, bn: BayesNetwork, variables: list, joint: np.ndarray, evidences: list[dict],
+                  possible: bool) -> list[tuple[dict, np.ndarray]]:
+        """
+        Returns the evidences whose probability is positive (or 0 when possible is False) with their conditioned joint.
+        """
+        conditioned = [(e, Condition(bn, variables, joint, e)) for e in evidences]
+        return [(e, table) for e, table in conditioned if (table.sum() > 0) == possible]
+
+    def testMarginals(self):
+        for name, (bn, variables, joint, evidences) in self.networks.items():
+            for e, table in self.Evidences(bn, variables, joint, evidences, True):
+                expected = {v: dict(zip(bn.Domain(v), table.sum(axis=tuple(j for j in range(table.ndim) if j != i))
+                                        / table.sum()))
+                            for i, v in enumerate(variables)}
+                for method in (bn.EnumerationAskAll, bn.EliminationAskAll, bn.EliminationAskAllJoint):
+                    result = method(dict(e))
+                    for v, distribution in expected.items():
+                        for value, p in distribution.items():
+                            with self.subTest(network=name, method=method.__name__, e=e, node=v, value=value):
+                                self.assertAlmostEqual(result[v][value], p, delta=TOLERANCE)
+
+    def testPathProbabilities(self):
+        for name, (bn, variables, joint, evidences) in self.networks.items():
+            paths = bn.AllSimplePathsEdges()[::max(1, len(bn.AllSimplePathsEdges()) // 40)]
+            for e, table in self.Evidences(bn, variables, joint, evidences[:len(evidences) // 2], True):
+                batch = bn.EliminationAskSetBatch(paths, dict(e))
+                for path, batchProbability in zip(paths, batch):
+                    fragile = {bn.Canonical(edge) for edge in path} & set(variables)
+                    index = tuple(1 if v in fragile else slice(None) for v in variables) # index 1 is False
+                    expected = table[index].sum() / table.sum()
+                    for method, result in (('EnumerationAskSet', bn.EnumerationAskSet(path, dict(e))),
+                                           ('EliminationAskSet', bn.EliminationAskSet(path, dict(e))),
+                                           ('EliminationAskSetBatch', batchProbability)):
+                        with self.subTest(network=name, method=method, e=e, path=path):
+                            self.assertAlmostEqual(result, expected, delta=TOLERANCE)
+
+    def testImpossibleEvidence(self):
+        # Evidence whose probability is 0 has no brute-force answer, so the queries are checked against enumeration
+        for name, (bn, variables, joint, evidences) in self.networks.items():
+            paths = bn.AllSimplePathsEdges()[::max(1, len(bn.AllSimplePathsEdges()) // 40)]
+            for e, _ in self.Evidences(bn, variables, joint, evidences, False):
+                expected = bn.EnumerationAskAll(dict(e))
+                for method in (bn.EliminationAskAll, bn.EliminationAskAllJoint):
+                    result = method(dict(e))
+                    for v, distribution in expected.items():
+                        for value, p in distribution.items():
+                            with self.subTest(network=name, method=method.__name__, e=e, node=v, value=value):
+                                self.assertAlmostEqual(result[v][value], p, delta=TOLERANCE)
+                batch = bn.EliminationAskSetBatch(paths, dict(e))
+                for path, batchProbability in zip(paths, batch):
+                    probability = bn.EnumerationAskSet(path, dict(e))
+                    with self.subTest(network=name, e=e, path=path):
+                        self.assertAlmostEqual(bn.EliminationAskSet(path, dict(e)), probability, delta=TOLERANCE)
+                        self.assertAlmostEqual(batchProbability, probability, delta=TOLERANCE)
+
+if __name__ == '__main__':
+    unittest.main()